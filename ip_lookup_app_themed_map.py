@@ -1,12 +1,22 @@
 import sys
 import json
 import os
-import requests
+import re
+import html
+import time
 import ipaddress
+from collections import OrderedDict
 from functools import partial
 
-from PySide6.QtCore import Qt, Slot, Signal, QObject, QThread, QUrl
-from PySide6.QtGui import QIcon
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from PySide6.QtCore import Qt, Slot, Signal, QObject, QByteArray, QTimer, QUrl, QUrlQuery
+from PySide6.QtGui import QColor, QIcon
+from PySide6.QtNetwork import QNetworkAccessManager, QNetworkReply, QNetworkRequest
+from PySide6.QtWebEngineCore import QWebEngineSettings
 from PySide6.QtWebEngineWidgets import QWebEngineView
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget,
@@ -17,6 +27,45 @@ from PySide6.QtWidgets import (
 )
 
 BOOKMARKS_FILE = "ip_bookmarks.json"
+MAP_HTML_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "map.html")
+CACHE_FILE = "ip_cache.json"
+CACHE_MAX_ENTRIES = 512
+CACHE_TTL_SECONDS = 24 * 60 * 60
+IPINFO_TOKEN = os.environ.get("IPINFO_TOKEN", "")
+BULK_CHUNK_SIZE = 100
+IPINFO_HOST = "ipinfo.io"
+REQUEST_TIMEOUT_MS = 10000
+VALIDATION_DEBOUNCE_MS = 200
+SAVE_DEBOUNCE_MS = 500
+RESULTS_PLACEHOLDER = "IP information will be displayed here."
+BUSY_PLACEHOLDER = "Fetching IP information..."
+INVALID_LOCATION = object()
+# Scripts sent to map.html; only setLocation needs formatting, with lat and lon.
+SET_LOCATION_JS = "setLocation(%s, %s);"
+CLEAR_LOCATION_JS = "clearLocation();"
+INVALID_LOCATION_JS = "clearLocation('Invalid location data.');"
+SET_THEME_JS = {True: "setTheme('dark');", False: "setTheme('light');"}
+IP_INFO_FIELDS = (
+    ('IP Address', 'ip'), ('Hostname', 'hostname'), ('City', 'city'),
+    ('Region', 'region'), ('Country', 'country'), ('Organization', 'org'),
+)
+
+# orjson is optional; both paths emit compact UTF-8 bytes and accept bytes input.
+if orjson is not None:
+    dump_json = orjson.dumps
+    load_json = orjson.loads
+else:
+    def dump_json(obj): return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+    load_json = json.loads
+
+# Cheap shape check run before ipaddress.ip_address, which raises on bad input.
+_IP_RE = re.compile(r'^(?:\d{1,3}(?:\.\d{1,3}){3}|[0-9A-Fa-f.]*:[0-9A-Fa-f:.]*(?:%\S+)?)$')
+
+
+def is_valid_ip(ip_text):
+    if not _IP_RE.match(ip_text): return False
+    try: ipaddress.ip_address(ip_text); return True
+    except ValueError: return False
 
 LIGHT_STYLE = """
     QWidget {
@@ -67,29 +116,116 @@ DARK_STYLE = """
     QWidget#BookmarkEntry QPushButton { padding: 4px 8px; font-size: 9pt; }
 """
 
-class IpInfoWorker(QObject):
+class IpCache:
+    """LRU of ipinfo.io responses, persisted to a JSON file between runs."""
+    def __init__(self, path=CACHE_FILE, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+    def load(self):
+        if not os.path.exists(self.path): return
+        try:
+            with open(self.path, 'rb') as f: stored = load_json(f.read())
+        except (ValueError, OSError): return
+        # The cache is disposable: anything that is not a well-formed entry is dropped.
+        if not isinstance(stored, dict): return
+        now = time.time()
+        for ip, entry in stored.items():
+            if not isinstance(entry, dict) or 'data' not in entry: continue
+            ts = entry.get('ts')
+            if isinstance(ts, (int, float)) and not isinstance(ts, bool) and now - ts <= self.ttl: self._entries[ip] = entry
+        while len(self._entries) > self.max_entries: self._entries.popitem(last=False)
+    def save(self):
+        try:
+            with open(self.path, 'wb') as f: f.write(dump_json(dict(self._entries)))
+        except OSError: pass
+    def get(self, ip):
+        entry = self._entries.get(ip)
+        if entry is None: return None
+        if time.time() - entry['ts'] > self.ttl:
+            del self._entries[ip]
+            return None
+        self._entries.move_to_end(ip)
+        return entry['data']
+    def set(self, ip, data):
+        self._entries[ip] = {'data': data, 'ts': time.time()}
+        self._entries.move_to_end(ip)
+        while len(self._entries) > self.max_entries: self._entries.popitem(last=False)
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=None, reason=None):
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+
+
+def ipinfo_request(url):
+    request = QNetworkRequest(url)
+    request.setTransferTimeout(REQUEST_TIMEOUT_MS)
+    request.setRawHeader(QByteArray(b"Accept"), QByteArray(b"application/json"))
+    return request
+
+
+def read_json_reply(reply):
+    """Return the decoded JSON body of a finished reply, or the error it failed with."""
+    if reply.error() != QNetworkReply.NetworkError.NoError:
+        status = reply.attribute(QNetworkRequest.Attribute.HttpStatusCodeAttribute)
+        reason = reply.attribute(QNetworkRequest.Attribute.HttpReasonPhraseAttribute)
+        return ApiError(reply.errorString(), status, reason)
+    try: return load_json(bytes(reply.readAll()))
+    except ValueError as e: return e
+
+
+def abort_reply(reply):
+    # Disconnect first so an intentional abort is never reported as a failed lookup.
+    reply.finished.disconnect(); reply.abort(); reply.deleteLater()
+
+
+class BulkLookup(QObject):
+    """Fetch ipinfo.io data for many IPs and emit one dict keyed by IP.
+
+    With an IPINFO_TOKEN the batch endpoint is used (one POST per 100 IPs);
+    without one it falls back to concurrent GETs, since batch requires a token.
+    IPs whose request failed map to the exception instead of a data dict.
+    """
     finished = Signal(object, object)
-    progress = Signal(str)
-    def __init__(self, ip_address, context=None):
-        super().__init__()
-        self.ip_address = ip_address
+    def __init__(self, nam, ip_addresses, cache=None, context=None, parent=None):
+        super().__init__(parent)
+        self.nam = nam
+        self.ip_addresses = list(ip_addresses)
+        self.cache = cache
         self.context = context if context is not None else {}
-        self._is_running = True
-    @Slot()
-    def run(self):
-        if not self._is_running:
-            self.finished.emit(RuntimeError("Operation cancelled by user"), self.context)
-            return
-        self.progress.emit(f"Fetching information for {self.ip_address}...")
-        api_url = f"https://ipinfo.io/{self.ip_address}/json"
-        try:
-            response = requests.get(api_url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            if self._is_running: self.finished.emit(data, self.context)
-        except Exception as e:
-            if self._is_running: self.finished.emit(e, self.context)
-    def stop(self): self._is_running = False
+        self._replies = set()
+        self._results = {}
+    def start(self):
+        if IPINFO_TOKEN:
+            url = QUrl("https://ipinfo.io/batch"); query = QUrlQuery(); query.addQueryItem('token', IPINFO_TOKEN); url.setQuery(query)
+            for start in range(0, len(self.ip_addresses), BULK_CHUNK_SIZE):
+                chunk = self.ip_addresses[start:start + BULK_CHUNK_SIZE]
+                request = ipinfo_request(url); request.setHeader(QNetworkRequest.KnownHeaders.ContentTypeHeader, "application/json")
+                self._track(self.nam.post(request, QByteArray(dump_json(chunk))), chunk)
+        else:
+            for ip in self.ip_addresses: self._track(self.nam.get(ipinfo_request(QUrl(f"https://ipinfo.io/{ip}/json"))), [ip])
+    def abort(self):
+        while self._replies: abort_reply(self._replies.pop())
+    def _track(self, reply, ips):
+        self._replies.add(reply)
+        reply.finished.connect(partial(self._on_reply, reply, ips))
+    def _on_reply(self, reply, ips):
+        self._replies.discard(reply); reply.deleteLater()
+        data = read_json_reply(reply)
+        if IPINFO_TOKEN and not isinstance(data, (dict, Exception)): data = ValueError("Unexpected batch response.")
+        for ip in ips:
+            if isinstance(data, Exception): self._results[ip] = data
+            elif IPINFO_TOKEN: self._results[ip] = data.get(ip, KeyError(ip))
+            else: self._results[ip] = data
+        if self._replies: return
+        if self.cache:
+            for result_ip, result_data in self._results.items():
+                if isinstance(result_data, dict) and 'error' not in result_data: self.cache.set(result_ip, result_data)
+        self.finished.emit(self._results, self.context)
 
 
 class IPLookupWindow(QMainWindow):
@@ -99,12 +235,25 @@ class IPLookupWindow(QMainWindow):
         self.setGeometry(100, 100, 950, 800)
         self.setWindowIcon(QIcon("icon.png"))
 
-        self.current_worker = None
-        self.current_thread = None
+        self.nam = QNetworkAccessManager(self)
+        self._current_reply = None
+        self.bulk_lookup = None
         self.current_ip_data = None
         self.bookmarks = []
+        self._bookmark_index = {}
+        self._save_timer = QTimer(self); self._save_timer.setSingleShot(True); self._save_timer.setInterval(SAVE_DEBOUNCE_MS)
+        self._save_timer.timeout.connect(self._write_bookmarks)
         self.editing_bookmark_index = -1
+        self._bookmark_actions = {
+            'show': self.on_show_bookmark_details_clicked, 'edit': self.on_edit_bookmark_clicked,
+            'delete': self.on_delete_bookmark_clicked, 'save': self.on_save_edited_bookmark_clicked,
+            'cancel': self.on_cancel_edit_bookmark_clicked,
+        }
         self.is_dark_mode = False
+        self._styles = {True: DARK_STYLE, False: LIGHT_STYLE}
+        self._map_backgrounds = {True: QColor("#2e2e2e"), False: QColor("#f0f0f0")}
+        self._applied_theme = None
+        self.ip_cache = IpCache()
 
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -132,10 +281,16 @@ class IPLookupWindow(QMainWindow):
         self.results_display = QTextEdit()
         self.results_display.setObjectName("ResultsDisplay")
         self.results_display.setReadOnly(True)
-        self.results_display.setPlaceholderText("IP information will be displayed here.")
+        self.results_display.setPlaceholderText(RESULTS_PLACEHOLDER)
         self.info_and_map_splitter.addWidget(self.results_display)
 
         self.map_view = QWebEngineView()
+        self.map_view.settings().setAttribute(QWebEngineSettings.WebAttribute.LocalContentCanAccessRemoteUrls, True)
+        self._map_ready = False
+        self._pending_map_js = []
+        self._last_map_coords = None
+        self.map_view.loadFinished.connect(self._on_map_loaded)
+        self.map_view.load(QUrl.fromLocalFile(MAP_HTML_FILE))
         self.info_and_map_splitter.addWidget(self.map_view)
 
         self.info_and_map_splitter.setSizes([self.width() // 2, self.width() // 2])
@@ -145,11 +300,19 @@ class IPLookupWindow(QMainWindow):
         main_layout.addWidget(separator)
         bookmarks_title_label = QLabel("Bookmarked IPs")
         bookmarks_title_label.setStyleSheet("font-weight: bold; font-size: 12pt; margin-top: 5px;")
-        main_layout.addWidget(bookmarks_title_label)
+        self.refresh_bookmarks_button = QPushButton("Refresh All Bookmarks")
+        bookmarks_header_layout = QHBoxLayout()
+        bookmarks_header_layout.addWidget(bookmarks_title_label)
+        bookmarks_header_layout.addStretch(1)
+        bookmarks_header_layout.addWidget(self.refresh_bookmarks_button)
+        main_layout.addLayout(bookmarks_header_layout)
         self.bookmarks_scroll_area = QScrollArea(); self.bookmarks_scroll_area.setWidgetResizable(True)
         self.bookmarks_widget_container = QWidget()
         self.bookmarks_layout = QVBoxLayout(self.bookmarks_widget_container)
         self.bookmarks_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
+        self._bookmark_widgets = []
+        self.no_bookmarks_label = QLabel("No bookmarks yet."); self.no_bookmarks_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.bookmarks_layout.addWidget(self.no_bookmarks_label)
         self.bookmarks_scroll_area.setWidget(self.bookmarks_widget_container)
         main_layout.addWidget(self.bookmarks_scroll_area, 1)
 
@@ -157,19 +320,33 @@ class IPLookupWindow(QMainWindow):
 
         self.lookup_button.clicked.connect(self.on_lookup_clicked)
         self.ip_input.returnPressed.connect(self.on_lookup_clicked)
+        self._validation_timer = QTimer(self); self._validation_timer.setSingleShot(True); self._validation_timer.setInterval(VALIDATION_DEBOUNCE_MS)
+        self._validation_timer.timeout.connect(self._on_ip_input_settled)
+        self.ip_input.textChanged.connect(self._validation_timer.start)
         self.bookmark_ip_button.clicked.connect(self.on_bookmark_current_ip_clicked)
         self.theme_toggle_button.clicked.connect(self.toggle_theme)
+        self.refresh_bookmarks_button.clicked.connect(self.on_refresh_bookmarks_clicked)
 
+        self.apply_theme()
+        # Disk reads and bookmark widgets wait until the window has painted once.
+        QTimer.singleShot(0, self._post_init)
+
+    @Slot()
+    def _post_init(self):
+        # Open the TLS connection ahead of time so the first lookup reuses it.
+        self.nam.connectToHostEncrypted(IPINFO_HOST)
         self.load_bookmarks()
+        self.ip_cache.load()
         self.render_bookmarks_list()
-        self.apply_theme()
-        self._update_map_display(None)
+        self._set_ui_state('idle')
 
     def apply_theme(self):
-        style = DARK_STYLE if self.is_dark_mode else LIGHT_STYLE
-        QApplication.instance().setStyleSheet(style)
+        if self._applied_theme == self.is_dark_mode: return
+        QApplication.instance().setStyleSheet(self._styles[self.is_dark_mode])
+        self._applied_theme = self.is_dark_mode
         self.theme_toggle_button.setText("Light Mode" if self.is_dark_mode else "Dark Mode")
-        self._update_map_display(self.current_ip_data.get('loc') if self.current_ip_data else None)
+        self.map_view.page().setBackgroundColor(self._map_backgrounds[self.is_dark_mode])
+        self._run_map_js(SET_THEME_JS[self.is_dark_mode])
 
     @Slot()
     def toggle_theme(self):
@@ -183,17 +360,19 @@ class IPLookupWindow(QMainWindow):
         self.results_display.clear()
         self._update_map_display(None)
         self.current_ip_data = None
-        self.bookmark_ip_button.setEnabled(False)
-        self._start_worker(ip_text, context={'type': 'lookup'})
+        self._start_lookup(ip_text, context={'type': 'lookup'})
 
     @Slot(object, object)
     def handle_api_result(self, result, context):
-        self.lookup_button.setEnabled(True)
         context_type = context.get('type', 'unknown')
+        if context_type == 'bulk_refresh':
+            self._apply_bulk_refresh(result)
+            return
         original_ip_for_update = context.get('original_ip_for_update')
         
         if isinstance(result, Exception):
             self._update_map_display(None)
+            self._set_ui_state('error', self._format_error_message(result))
             return
             
         if isinstance(result, dict):
@@ -201,103 +380,87 @@ class IPLookupWindow(QMainWindow):
                 self.current_ip_data = result
                 self._display_ip_info(result)
                 self._update_map_display(result.get('loc'))
-                self.status_bar.showMessage(f"Fetched info for {result.get('ip', 'N/A')}.")
-                self.bookmark_ip_button.setEnabled(not any(b['ip'] == result.get('ip') for b in self.bookmarks))
+                self._set_ui_state('ok', f"Fetched info for {result.get('ip', 'N/A')}.")
 
             elif context_type == 'bookmark_update':
                 new_ip_data = result
-                target_index = -1
-                for idx, bm in enumerate(self.bookmarks):
-                    if bm['ip'] == original_ip_for_update:
-                        target_index = idx
-                        break
+                target_index = self._bookmark_index.get(original_ip_for_update, -1)
+                new_ip = new_ip_data.get('ip', original_ip_for_update)
+                if target_index != -1 and self._bookmark_index.get(new_ip, target_index) != target_index:
+                    self._set_ui_state('ok', f"{new_ip} is already bookmarked; update discarded.")
+                    return
                 if target_index != -1:
                     self.bookmarks[target_index] = new_ip_data.copy()
+                    del self._bookmark_index[original_ip_for_update]
+                    self._bookmark_index[new_ip] = target_index
                     self.save_bookmarks()
                     self.editing_bookmark_index = -1
+                    self.current_ip_data = self.bookmarks[target_index]
                     self._display_ip_info(new_ip_data)
                     self._update_map_display(new_ip_data.get('loc'))
-                self.render_bookmarks_list()
+                    self._replace_bookmark_row(target_index, self.bookmarks[target_index])
+                if target_index != -1: self._set_ui_state('ok', f"Bookmark updated to {new_ip}.")
+                else: self._set_ui_state('ok', "Bookmark no longer exists; update discarded.")
+        else:
+            self._set_ui_state('error', "Error: unexpected API response.")
+
+    def _apply_bulk_refresh(self, result):
+        self.bulk_lookup.deleteLater(); self.bulk_lookup = None
+        self.refresh_bookmarks_button.setEnabled(True)
+        refreshed, skipped = 0, 0
+        current_ip = self.current_ip_data.get('ip') if self.current_ip_data else None
+        for idx, bm in enumerate(self.bookmarks):
+            # Leave the row being edited alone so the user's unsaved text survives.
+            if idx == self.editing_bookmark_index: skipped += 1; continue
+            new_data = result.get(bm['ip'])
+            if isinstance(new_data, dict) and 'error' not in new_data:
+                self.bookmarks[idx] = new_data; refreshed += 1
+                self._replace_bookmark_row(idx, new_data)
+                if bm['ip'] == current_ip:
+                    self.current_ip_data = new_data
+                    self._display_ip_info(new_data)
+                    self._update_map_display(new_data.get('loc'))
+        if refreshed:
+            self._rebuild_bookmark_index()
+            self.save_bookmarks()
+        failed = len(self.bookmarks) - refreshed - skipped
+        failed_text = f" ({failed} failed)" if failed else ""
+        self.status_bar.showMessage(f"Refreshed {refreshed} of {len(self.bookmarks)} bookmarks{failed_text}.")
 
     def _display_ip_info(self, data_dict):
         if not data_dict or not isinstance(data_dict, dict):
             self.results_display.setHtml("<font color='orange'>No data to display.</font>")
             return
-        ip = data_dict.get('ip', 'N/A')
-        city = data_dict.get('city', 'N/A')
-        region = data_dict.get('region', 'N/A')
-        country = data_dict.get('country', 'N/A')
-        org = data_dict.get('org', 'N/A')
-        hostname = data_dict.get('hostname', 'N/A')
-
-        output_html = f"""
-        <b>IP Address:</b> {ip}<br>
-        <b>Hostname:</b> {hostname if hostname else 'N/A'}<br>
-        <b>City:</b> {city if city else 'N/A'}<br>
-        <b>Region:</b> {region if region else 'N/A'}<br>
-        <b>Country:</b> {country if country else 'N/A'}<br>
-        <b>Organization:</b> {org if org else 'N/A'}<br>
-        """
-        self.results_display.setHtml(output_html)
-        self.ip_input.setText(ip)
+        parts = [f"<b>{label}:</b> {html.escape(str(data_dict.get(key) or 'N/A'))}<br>" for label, key in IP_INFO_FIELDS]
+        self.results_display.setHtml(''.join(parts))
+        self.ip_input.setText(data_dict.get('ip') or 'N/A')
 
     def _update_map_display(self, location_coordinates_str):
+        coords = None
         if location_coordinates_str and location_coordinates_str != 'N/A':
             try:
                 lat, lon = [float(c.strip()) for c in location_coordinates_str.split(',')]
-                html = f"""
-                <!DOCTYPE html>
-                <html>
-                <head>
-                  <title>OpenLayers Map</title>
-                  <meta charset="utf-8" />
-                  <style>
-                    html, body, #map {{
-                      margin: 0;
-                      padding: 0;
-                      width: 100%;
-                      height: 100%;
-                    }}
-                  </style>
-                  <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/ol@v7.4.0/ol.css">
-                  <script src="https://cdn.jsdelivr.net/npm/ol@v7.4.0/dist/ol.js"></script>
-                </head>
-                <body>
-                  <div id="map"></div>
-                  <script>
-                    var map = new ol.Map({{
-                      target: 'map',
-                      layers: [
-                        new ol.layer.Tile({{
-                          source: new ol.source.OSM()
-                        }})
-                      ],
-                      view: new ol.View({{
-                        center: ol.proj.fromLonLat([{lon}, {lat}]),
-                        zoom: 11
-                      }})
-                    }});
-                    var marker = new ol.Feature({{
-                      geometry: new ol.geom.Point(ol.proj.fromLonLat([{lon}, {lat}]))
-                    }});
-                    var vectorSource = new ol.source.Vector({{
-                      features: [marker]
-                    }});
-                    var markerVectorLayer = new ol.layer.Vector({{
-                      source: vectorSource
-                    }});
-                    map.addLayer(markerVectorLayer);
-                  </script>
-                </body>
-                </html>
-                """
-                self.map_view.setHtml(html)
+                coords = (lat, lon)
             except (ValueError, IndexError):
-                html_content = f"<body style='background-color:{'#2e2e2e' if self.is_dark_mode else '#f0f0f0'}; color:{'#e0e0e0' if self.is_dark_mode else '#333'}; text-align:center; padding-top: 20px;'>Invalid location data.</body>"
-                self.map_view.setHtml(html_content)
-        else:
-            html_content = f"<body style='background-color:{'#2e2e2e' if self.is_dark_mode else '#f0f0f0'}; color:{'#e0e0e0' if self.is_dark_mode else '#333'}; text-align:center; padding-top: 20px;'>Map will be displayed here.</body>"
-            self.map_view.setHtml(html_content)
+                coords = INVALID_LOCATION
+        if coords == self._last_map_coords: return
+        self._last_map_coords = coords
+        if coords is None: self._run_map_js(CLEAR_LOCATION_JS)
+        elif coords is INVALID_LOCATION: self._run_map_js(INVALID_LOCATION_JS)
+        else: self._run_map_js(SET_LOCATION_JS % coords)
+
+    def _run_map_js(self, script):
+        if self._map_ready: self.map_view.page().runJavaScript(script)
+        else: self._pending_map_js.append(script)
+
+    @Slot(bool)
+    def _on_map_loaded(self, ok):
+        self._map_ready = True
+        # A load with nothing queued is a fresh page showing its placeholder; queued
+        # scripts leave the page in the state _last_map_coords already records.
+        if not self._pending_map_js: self._last_map_coords = None
+        for script in self._pending_map_js: self.map_view.page().runJavaScript(script)
+        self._pending_map_js = []
 
     @Slot()
     def on_show_bookmark_details_clicked(self, index):
@@ -306,111 +469,168 @@ class IPLookupWindow(QMainWindow):
             self.current_ip_data = bookmark_data
             self._display_ip_info(bookmark_data)
             self._update_map_display(bookmark_data.get('loc'))
-            self.status_bar.showMessage(f"Displaying bookmarked IP: {bookmark_data.get('ip')}")
-            self.bookmark_ip_button.setEnabled(False)
+            self._set_ui_state('ok', f"Displaying bookmarked IP: {bookmark_data.get('ip')}")
     
-    def _start_worker(self, ip_address, context):
-        self.lookup_button.setEnabled(False); self.bookmark_ip_button.setEnabled(False)
-        self.status_bar.showMessage(f"Processing {ip_address}...")
-        if self.current_thread and self.current_thread.isRunning():
-            if self.current_worker: self.current_worker.stop()
-            self.current_thread.quit(); self.current_thread.wait(1000)
-        self.current_thread = QThread(self)
-        self.current_worker = IpInfoWorker(ip_address, context)
-        self.current_worker.moveToThread(self.current_thread)
-        self.current_worker.finished.connect(self.handle_api_result)
-        self.current_worker.progress.connect(self.status_bar.showMessage)
-        self.current_thread.started.connect(self.current_worker.run)
-        self.current_thread.finished.connect(self.current_thread.deleteLater)
-        self.current_worker.finished.connect(self.current_worker.deleteLater)
-        self.current_thread.start()
+    def _start_lookup(self, ip_address, context):
+        self._set_ui_state('busy', f"Processing {ip_address}...")
+        if self._current_reply: abort_reply(self._current_reply); self._current_reply = None
+        cached = self.ip_cache.get(ip_address)
+        if cached is not None: self.handle_api_result(cached, context); return
+        self._current_reply = self.nam.get(ipinfo_request(QUrl(f"https://ipinfo.io/{ip_address}/json")))
+        self._current_reply.finished.connect(partial(self._on_reply, self._current_reply, context, ip_address))
+
+    def _on_reply(self, reply, context, ip_address):
+        reply.deleteLater()
+        if reply is self._current_reply: self._current_reply = None
+        result = read_json_reply(reply)
+        if not isinstance(result, Exception): self.ip_cache.set(ip_address, result)
+        self.handle_api_result(result, context)
+
+    @Slot()
+    def on_refresh_bookmarks_clicked(self):
+        if not self.bookmarks or self.bulk_lookup: return
+        self.refresh_bookmarks_button.setEnabled(False)
+        self.status_bar.showMessage(f"Refreshing {len(self.bookmarks)} bookmarked IPs...")
+        self.bulk_lookup = BulkLookup(self.nam, [b['ip'] for b in self.bookmarks], self.ip_cache, {'type': 'bulk_refresh'}, self)
+        self.bulk_lookup.finished.connect(self.handle_api_result)
+        self.bulk_lookup.start()
+
+    @Slot()
+    def _on_ip_input_settled(self):
+        if self._current_reply is not None: return
+        self._set_ui_state('idle')
+
+    def _set_ui_state(self, state, message=None):
+        """Apply one of 'idle', 'busy', 'error' or 'ok' to the lookup controls in a single pass."""
+        busy = state == 'busy'
+        input_ok = state != 'idle' or is_valid_ip(self.ip_input.text().strip())
+        self.lookup_button.setEnabled(not busy and self._current_reply is None and input_ok)
+        if busy: self.bookmark_ip_button.setEnabled(False)
+        else: self._refresh_bookmark_button()
+        self.results_display.setPlaceholderText(BUSY_PLACEHOLDER if busy else RESULTS_PLACEHOLDER)
+        if message: self.status_bar.showMessage(message)
 
     def _validate_ip_format(self, ip_text, show_error_dialog=True):
         if not ip_text:
             if show_error_dialog: QMessageBox.warning(self, "Input Error", "Please enter an IP address.")
             return False
-        try: ipaddress.ip_address(ip_text); return True
-        except ValueError:
-            if show_error_dialog: QMessageBox.warning(self, "Invalid IP", f"'{ip_text}' is not valid.")
-            self.status_bar.showMessage("Invalid IP address format.")
-            return False
+        if is_valid_ip(ip_text): return True
+        if show_error_dialog: QMessageBox.warning(self, "Invalid IP", f"'{ip_text}' is not valid.")
+        self.status_bar.showMessage("Invalid IP address format.")
+        return False
 
     def _format_error_message(self, error_obj):
         error_message = f"Error: {str(error_obj)}"
-        if isinstance(error_obj, requests.exceptions.HTTPError):
-            error_message = f"API Error: {error_obj.response.status_code} - {error_obj.response.reason}"
+        if isinstance(error_obj, ApiError) and error_obj.status:
+            error_message = f"API Error: {error_obj.status} - {error_obj.reason}"
         return error_message
     def load_bookmarks(self):
         if os.path.exists(BOOKMARKS_FILE):
             try:
-                with open(BOOKMARKS_FILE, 'r', encoding='utf-8') as f: self.bookmarks = json.load(f)
+                with open(BOOKMARKS_FILE, 'rb') as f: self.bookmarks = load_json(f.read())
             except (json.JSONDecodeError, Exception) as e: self.bookmarks = []; QMessageBox.warning(self, "Load Error", f"Could not load '{BOOKMARKS_FILE}': {e}")
         else: self.bookmarks = []
+        self._rebuild_bookmark_index()
+    def _rebuild_bookmark_index(self):
+        self._bookmark_index = {bm['ip']: idx for idx, bm in enumerate(self.bookmarks)}
     def save_bookmarks(self):
+        # Bursts of edits collapse into one write once the timer settles.
+        self._save_timer.start()
+    @Slot()
+    def _write_bookmarks(self):
+        tmp_path = BOOKMARKS_FILE + '.tmp'
         try:
-            with open(BOOKMARKS_FILE, 'w', encoding='utf-8') as f: json.dump(self.bookmarks, f, indent=2)
+            with open(tmp_path, 'wb') as f: f.write(dump_json(self.bookmarks))
+            os.replace(tmp_path, BOOKMARKS_FILE)
         except Exception as e: QMessageBox.critical(self, "Save Error", f"Could not save: {e}")
     @Slot()
     def on_bookmark_current_ip_clicked(self):
         if not self.current_ip_data or 'ip' not in self.current_ip_data: return
         ip_to_bookmark = self.current_ip_data['ip']
-        if any(b['ip'] == ip_to_bookmark for b in self.bookmarks): return
-        self.bookmarks.append(self.current_ip_data.copy()); self.save_bookmarks()
-        self.render_bookmarks_list(); self.status_bar.showMessage(f"IP {ip_to_bookmark} bookmarked.")
-        self.bookmark_ip_button.setEnabled(False)
+        if ip_to_bookmark in self._bookmark_index: return
+        self.bookmarks.append(self.current_ip_data.copy()); self._bookmark_index[ip_to_bookmark] = len(self.bookmarks) - 1
+        self.save_bookmarks()
+        self._insert_bookmark_row(len(self.bookmarks) - 1, self.bookmarks[-1]); self.status_bar.showMessage(f"IP {ip_to_bookmark} bookmarked.")
+        self._refresh_bookmark_button()
+    def _refresh_bookmark_button(self):
+        current_ip = self.current_ip_data.get('ip') if self.current_ip_data else None
+        self.bookmark_ip_button.setEnabled(bool(current_ip) and current_ip not in self._bookmark_index)
     def render_bookmarks_list(self):
-        while self.bookmarks_layout.count():
-            child = self.bookmarks_layout.takeAt(0)
-            if child.widget(): child.widget().deleteLater()
-        if not self.bookmarks:
-            no_bookmarks_label = QLabel("No bookmarks yet."); no_bookmarks_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.bookmarks_layout.addWidget(no_bookmarks_label)
-            return
-        for index, bookmark_data in enumerate(self.bookmarks):
-            entry_widget = self._create_bookmark_entry_widget(bookmark_data, index)
-            self.bookmarks_layout.addWidget(entry_widget)
+        while self._bookmark_widgets: self._remove_bookmark_row(len(self._bookmark_widgets) - 1)
+        for index, bookmark_data in enumerate(self.bookmarks): self._insert_bookmark_row(index, bookmark_data)
+        self.no_bookmarks_label.setVisible(not self.bookmarks)
+    # Rows sit before no_bookmarks_label, so a row's layout position equals its bookmark index.
+    def _insert_bookmark_row(self, index, bookmark_data):
+        entry_widget = self._create_bookmark_entry_widget(bookmark_data, index)
+        self.bookmarks_layout.insertWidget(index, entry_widget); self._bookmark_widgets.insert(index, entry_widget)
+        self.no_bookmarks_label.setVisible(False)
+    def _remove_bookmark_row(self, index):
+        entry_widget = self._bookmark_widgets.pop(index)
+        self.bookmarks_layout.removeWidget(entry_widget); entry_widget.deleteLater()
+        self.no_bookmarks_label.setVisible(not self._bookmark_widgets)
+    def _replace_bookmark_row(self, index, bookmark_data):
+        self._remove_bookmark_row(index); self._insert_bookmark_row(index, bookmark_data)
+    def _create_bookmark_button(self, text, action):
+        button = QPushButton(text); button.setProperty("action", action)
+        button.clicked.connect(self.on_bookmark_button_clicked)
+        return button
+    @Slot()
+    def on_bookmark_button_clicked(self):
+        # Resolve the row from the button's entry widget at click time; indices shift when earlier rows are deleted.
+        button = self.sender()
+        entry_widget = button.parentWidget()
+        index = self._bookmark_widgets.index(entry_widget) if entry_widget in self._bookmark_widgets else -1
+        self._bookmark_actions[button.property("action")](index)
     def _create_bookmark_entry_widget(self, bookmark_data, index):
         entry_widget = QWidget(); entry_widget.setObjectName("BookmarkEntry")
         entry_layout = QHBoxLayout(entry_widget); entry_layout.setContentsMargins(5, 5, 5, 5)
         ip_addr, city = bookmark_data.get('ip', 'N/A'), bookmark_data.get('city', 'N/A')
         identifier_text = f"{ip_addr} ({city if city else 'Unknown'})"
         if self.editing_bookmark_index == index:
-            ip_edit_input = QLineEdit(ip_addr); entry_layout.addWidget(ip_edit_input, 2)
-            save_button = QPushButton("Save"); save_button.clicked.connect(partial(self.on_save_edited_bookmark_clicked, index, ip_edit_input)); entry_layout.addWidget(save_button)
-            cancel_button = QPushButton("Cancel"); cancel_button.clicked.connect(partial(self.on_cancel_edit_bookmark_clicked, index)); entry_layout.addWidget(cancel_button)
+            entry_layout.addWidget(QLineEdit(ip_addr), 2)
+            entry_layout.addWidget(self._create_bookmark_button("Save", "save"))
+            entry_layout.addWidget(self._create_bookmark_button("Cancel", "cancel"))
         else:
             label = QLabel(identifier_text); label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Preferred); entry_layout.addWidget(label, 2)
-            show_details_button = QPushButton("Show Details"); show_details_button.clicked.connect(partial(self.on_show_bookmark_details_clicked, index)); entry_layout.addWidget(show_details_button)
-            edit_button = QPushButton("Edit"); edit_button.clicked.connect(partial(self.on_edit_bookmark_clicked, index)); entry_layout.addWidget(edit_button)
-            delete_button = QPushButton("Delete"); delete_button.clicked.connect(partial(self.on_delete_bookmark_clicked, index)); entry_layout.addWidget(delete_button)
+            entry_layout.addWidget(self._create_bookmark_button("Show Details", "show"))
+            entry_layout.addWidget(self._create_bookmark_button("Edit", "edit"))
+            entry_layout.addWidget(self._create_bookmark_button("Delete", "delete"))
         return entry_widget
     @Slot()
     def on_edit_bookmark_clicked(self, index):
+        if not 0 <= index < len(self.bookmarks): return
         if self.editing_bookmark_index != -1 and self.editing_bookmark_index != index: return
-        self.editing_bookmark_index = index; self.render_bookmarks_list()
+        self.editing_bookmark_index = index; self._replace_bookmark_row(index, self.bookmarks[index])
     @Slot()
     def on_delete_bookmark_clicked(self, index):
         if 0 <= index < len(self.bookmarks):
             ip_to_delete = self.bookmarks[index]['ip']
             if QMessageBox.question(self, "Confirm Delete", f"Delete {ip_to_delete}?", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No) == QMessageBox.StandardButton.Yes:
-                del self.bookmarks[index]; self.save_bookmarks()
+                del self.bookmarks[index]; self._rebuild_bookmark_index(); self.save_bookmarks()
                 if self.editing_bookmark_index == index: self.editing_bookmark_index = -1
-                self.render_bookmarks_list()
-                if self.current_ip_data and self.current_ip_data.get('ip') == ip_to_delete: self.bookmark_ip_button.setEnabled(True)
+                elif self.editing_bookmark_index > index: self.editing_bookmark_index -= 1
+                self._remove_bookmark_row(index)
+                self._refresh_bookmark_button()
     @Slot()
-    def on_save_edited_bookmark_clicked(self, index, ip_edit_input_widget):
-        new_ip_text = ip_edit_input_widget.text().strip(); original_ip = self.bookmarks[index]['ip']
+    def on_save_edited_bookmark_clicked(self, index):
+        if not 0 <= index < len(self.bookmarks): return
+        new_ip_text = self._bookmark_widgets[index].findChild(QLineEdit).text().strip(); original_ip = self.bookmarks[index]['ip']
         if not self._validate_ip_format(new_ip_text): return
-        if new_ip_text == original_ip: self.editing_bookmark_index = -1; self.render_bookmarks_list(); return
-        if any(i != index and bm['ip'] == new_ip_text for i, bm in enumerate(self.bookmarks)): return
-        self._start_worker(new_ip_text, context={'type': 'bookmark_update', 'original_ip_for_update': original_ip})
+        # Compare canonical forms; the API returns e.g. '2001:db8::1' for '2001:DB8::1'.
+        new_ip_text = str(ipaddress.ip_address(new_ip_text))
+        if new_ip_text == original_ip: self.on_cancel_edit_bookmark_clicked(index); return
+        if self._bookmark_index.get(new_ip_text, index) != index:
+            self.status_bar.showMessage(f"{new_ip_text} is already bookmarked."); return
+        self._start_lookup(new_ip_text, context={'type': 'bookmark_update', 'original_ip_for_update': original_ip})
     @Slot()
     def on_cancel_edit_bookmark_clicked(self, index):
-        self.editing_bookmark_index = -1; self.render_bookmarks_list()
+        self.editing_bookmark_index = -1
+        if 0 <= index < len(self.bookmarks): self._replace_bookmark_row(index, self.bookmarks[index])
     def closeEvent(self, event):
-        if self.current_thread and self.current_thread.isRunning():
-            if self.current_worker: self.current_worker.stop()
-            self.current_thread.quit(); self.current_thread.wait(1500)
+        if self._current_reply: abort_reply(self._current_reply); self._current_reply = None
+        if self.bulk_lookup: self.bulk_lookup.abort()
+        if self._save_timer.isActive(): self._save_timer.stop(); self._write_bookmarks()
+        self.ip_cache.save()
         event.accept()
 
 if __name__ == '__main__':